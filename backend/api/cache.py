@@ -0,0 +1,85 @@
+import time
+
+from django.core.cache import cache
+
+from users.models import Subscribe
+
+REQUEST_CACHE_ATTR = '_foodgram_cache'
+
+RECIPE = 'recipe'
+RECIPES = 'recipes'
+RECIPE_IDS = 'recipe_ids'
+USER = 'user'
+USERS = 'users'
+STATE = 'state'
+CATALOG = 'catalog'
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+
+
+def _request_cache(request):
+    if not hasattr(request, REQUEST_CACHE_ATTR):
+        setattr(request, REQUEST_CACHE_ATTR, {})
+    return getattr(request, REQUEST_CACHE_ATTR)
+
+
+def _ids_key(model, field, user_id):
+    return f'{model._meta.model_name}:{field}:{user_id}'
+
+
+def _get_ids(request, model, field):
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+    local = _request_cache(request)
+    key = _ids_key(model, field, user.id)
+    if key not in local:
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(
+                model.objects.filter(user=user).values_list(field, flat=True)
+            )
+            cache.set(key, ids)
+        local[key] = ids
+    return local[key]
+
+
+def get_recipe_ids(request, model):
+    return _get_ids(request, model, 'recipe_id')
+
+
+def invalidate_recipe_ids(model, *user_ids):
+    cache.delete_many([_ids_key(model, 'recipe_id', pk) for pk in user_ids])
+    bump_versions(STATE, *user_ids)
+
+
+def get_author_ids(request):
+    return _get_ids(request, Subscribe, 'author_id')
+
+
+def invalidate_author_ids(*user_ids):
+    cache.delete_many(
+        [_ids_key(Subscribe, 'author_id', pk) for pk in user_ids]
+    )
+    bump_versions(STATE, *user_ids)
+
+
+def _version_key(name, pk):
+    return f'{name}:version:{pk}'
+
+
+def get_versions(*objects):
+    keys = {_version_key(name, pk): (name, pk) for name, pk in objects}
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_versions(name, *pks):
+    now = time.time()
+    cache.set_many(
+        {_version_key(name, pk): now for pk in pks}, timeout=None
+    )
@@ -0,0 +1,162 @@
+import gzip
+import json
+import time
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from hashlib import sha1
+from threading import Lock
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from api.cache import (INGREDIENTS, RECIPE_IDS, TAGS, bump_versions,
+                       get_versions)
+from recipes.models import Ingredient, Recipe, Tag
+
+
+class VersionedCatalog:
+    version_name = None
+    model = None
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = (None, None)
+        self._stamp = None
+        self._checked_at = 0
+
+    def get_stamp(self):
+        return self.model.objects.aggregate(
+            count=Count('id'), last=Max('id')
+        )
+
+    def is_stale(self):
+        now = time.monotonic()
+        if now - self._checked_at < settings.CATALOG_STAMP_INTERVAL:
+            return False
+        self._checked_at = now
+        return self.get_stamp() != self._stamp
+
+    def get_snapshot(self):
+        if self._snapshot[0] is not None and self.is_stale():
+            bump_versions(self.version_name, 0)
+        key = (self.version_name, 0)
+        version = get_versions(key)[key]
+        if self._snapshot[0] != version:
+            with self._lock:
+                if self._snapshot[0] != version:
+                    self._stamp = self.get_stamp()
+                    self._checked_at = time.monotonic()
+                    self._snapshot = (version, self.build())
+        return self._snapshot
+
+    def build(self):
+        raise NotImplementedError
+
+
+IngredientCatalog = namedtuple(
+    'IngredientCatalog', ('keys', 'items', 'raw', 'compressed', 'etag')
+)
+
+
+class IngredientIndex(VersionedCatalog):
+    version_name = INGREDIENTS
+    model = Ingredient
+
+    def __init__(self):
+        super().__init__()
+        self._history = OrderedDict()
+
+    def build(self):
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].casefold(), item['id'])
+        )
+        keys = [item['name'].casefold() for item in items]
+        raw = json.dumps(
+            items, ensure_ascii=False, separators=(',', ':')
+        ).encode()
+        etag = sha1(raw).hexdigest()
+        self._history[etag] = {item['id']: item for item in items}
+        self._history.move_to_end(etag)
+        while len(self._history) > settings.INGREDIENT_CATALOG_HISTORY:
+            self._history.popitem(last=False)
+        return IngredientCatalog(
+            keys, items, raw, gzip.compress(raw, mtime=0), etag
+        )
+
+    def get_catalog(self):
+        return self.get_snapshot()[1]
+
+    def delta(self, since):
+        catalog = self.get_catalog()
+        current = self._history.get(catalog.etag, {})
+        previous = self._history.get(since)
+        if previous is None:
+            return {
+                'version': catalog.etag,
+                'reset': True,
+                'changed': catalog.items,
+                'deleted': [],
+            }
+        return {
+            'version': catalog.etag,
+            'reset': False,
+            'changed': [
+                item for pk, item in current.items()
+                if previous.get(pk) != item
+            ],
+            'deleted': [pk for pk in previous if pk not in current],
+        }
+
+    def search(self, prefix='', limit=None):
+        keys, items = self.get_catalog()[:2]
+        prefix = prefix.strip().casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return items[start:end]
+
+
+class TagCatalog(VersionedCatalog):
+    version_name = TAGS
+    model = Tag
+
+    def build(self):
+        tags = list(Tag.objects.order_by('id').values('id', 'name', 'slug'))
+        return tags, {tag['slug']: tag['id'] for tag in tags}
+
+    def all(self):
+        return self.get_snapshot()[1][0]
+
+    def slug_choices(self):
+        return [(tag['slug'], tag['name']) for tag in self.all()]
+
+    def get_ids(self, slugs):
+        _, (_, ids) = self.get_snapshot()
+        return [ids[slug] for slug in slugs if slug in ids]
+
+
+class RecipeIdSet(VersionedCatalog):
+    version_name = RECIPE_IDS
+    model = Recipe
+
+    def build(self):
+        ids = Recipe.objects.order_by().values_list('id', flat=True)
+        bitmap = bytearray()
+        for recipe_id in ids.iterator(chunk_size=10000):
+            index, bit = divmod(recipe_id, 8)
+            if index >= len(bitmap):
+                bitmap.extend(bytes(index - len(bitmap) + 1))
+            bitmap[index] |= 1 << bit
+        return bytes(bitmap)
+
+    def __contains__(self, recipe_id):
+        _, bitmap = self.get_snapshot()
+        index, bit = divmod(recipe_id, 8)
+        return 0 <= index < len(bitmap) and bool(bitmap[index] >> bit & 1)
+
+
+ingredient_index = IngredientIndex()
+tag_catalog = TagCatalog()
+recipe_ids = RecipeIdSet()
@@ -0,0 +1,116 @@
+import csv
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import storages
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_FONT = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
+
+def format_row(row):
+    return (
+        f'- {row["ingredient__name"]} '
+        f'({row["ingredient__measurement_unit"]})'
+        f' - {row["total_amount"]}'
+    )
+
+
+def export_txt(user, rows):
+    yield f'Список покупок для: {user.get_full_name()}\n\n'.encode()
+    separator = ''
+    for row in rows:
+        yield f'{separator}{format_row(row)}'.encode()
+        separator = '\n'
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def export_csv(user, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ('Ингредиент', 'Единица измерения', 'Количество')
+    ).encode()
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['total_amount'],
+        )).encode()
+
+
+def get_pdf_font():
+    if PDF_FONT in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT
+    if not os.path.exists(settings.SHOPPING_LIST_FONT):
+        return 'Helvetica'
+    pdfmetrics.registerFont(TTFont(PDF_FONT, settings.SHOPPING_LIST_FONT))
+    return PDF_FONT
+
+
+def read_chunks(file):
+    while chunk := file.read(settings.SHOPPING_LIST_CHUNK_SIZE):
+        yield chunk
+
+
+def export_pdf(user, rows):
+    buffer = tempfile.TemporaryFile()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    font = get_pdf_font()
+    _, height = A4
+    y = height - PDF_MARGIN
+    lines = (f'Список покупок для: {user.get_full_name()}', '')
+    for line in (*lines, *(format_row(row) for row in rows)):
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = height - PDF_MARGIN
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_FONT_SIZE * 1.5
+    pdf.save()
+    with buffer:
+        buffer.seek(0)
+        yield from read_chunks(buffer)
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'pdf': export_pdf,
+}
+
+
+def get_stored_export(cache_key):
+    storage = storages['exports']
+    name = cache.get(cache_key)
+    if name and storage.exists(name):
+        return storage.open(name)
+    return None
+
+
+def store_while_streaming(chunks, path, cache_key):
+    storage = storages['exports']
+    with tempfile.TemporaryFile() as tmp:
+        for chunk in chunks:
+            tmp.write(chunk)
+            yield chunk
+        tmp.seek(0)
+        name = storage.save(path, File(tmp))
+    latest_key = f'export:latest:{path}'
+    previous = cache.get(latest_key)
+    if previous and previous != name:
+        storage.delete(previous)
+    cache.set(latest_key, name, None)
+    cache.set(cache_key, name, settings.SHOPPING_LIST_CACHE_TIMEOUT)
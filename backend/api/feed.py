@@ -0,0 +1,139 @@
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+
+from api.cache import get_author_ids
+from recipes.models import FeedItem, Recipe
+from recipes.utils import batched
+from users.models import Subscribe
+
+POPULAR_AUTHORS_KEY = 'feed:popular_authors'
+
+logger = logging.getLogger(__name__)
+
+backfill_executor = ThreadPoolExecutor(
+    max_workers=settings.FEED_BACKFILL_WORKERS,
+    thread_name_prefix='feed-backfill'
+)
+
+
+def get_popular_author_ids():
+    author_ids = cache.get(POPULAR_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            Subscribe.objects.values('author').annotate(
+                total=Count('id')
+            ).filter(
+                total__gt=settings.FEED_FANOUT_LIMIT
+            ).values_list('author', flat=True)
+        )
+        cache.set(
+            POPULAR_AUTHORS_KEY, author_ids,
+            settings.FEED_POPULAR_AUTHORS_TIMEOUT
+        )
+    return author_ids
+
+
+def is_popular(author_id):
+    return Subscribe.objects.filter(author_id=author_id).count() > (
+        settings.FEED_FANOUT_LIMIT
+    )
+
+
+def get_follower_ids(author_id):
+    return Subscribe.objects.filter(author_id=author_id).order_by(
+        'id'
+    ).values_list('user_id', flat=True).iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+    )
+
+
+def get_backfill_ids(author_id):
+    return list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-id'
+    ).values_list('id', flat=True)[:settings.FEED_BACKFILL_SIZE])
+
+
+def add_feed_items(user_ids, recipe_ids):
+    for batch in batched(user_ids, settings.FEED_FANOUT_BATCH_SIZE):
+        FeedItem.objects.bulk_create(
+            [
+                FeedItem(user_id=user_id, recipe_id=recipe_id)
+                for user_id in batch for recipe_id in recipe_ids
+            ],
+            batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+def fan_out(recipe_id, author_id):
+    if is_popular(author_id):
+        cache.delete(POPULAR_AUTHORS_KEY)
+        return
+    add_feed_items(get_follower_ids(author_id), [recipe_id])
+
+
+def fan_out_recipe(recipe):
+    recipe_id, author_id = recipe.id, recipe.author_id
+    transaction.on_commit(lambda: fan_out(recipe_id, author_id))
+
+
+def backfill_author(author_id):
+    add_feed_items(get_follower_ids(author_id), get_backfill_ids(author_id))
+
+
+def backfill_in_background(author_id):
+    try:
+        backfill_author(author_id)
+    except Exception:
+        logger.exception('Failed to backfill feed for author %s', author_id)
+    finally:
+        connection.close()
+
+
+def fan_in_author(user_id, author_id):
+    if is_popular(author_id):
+        cache.delete(POPULAR_AUTHORS_KEY)
+        return
+    add_feed_items([user_id], get_backfill_ids(author_id))
+
+
+def remove_author(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+    total = Subscribe.objects.filter(author_id=author_id).count()
+    if total == settings.FEED_FANOUT_LIMIT:
+        cache.delete(POPULAR_AUTHORS_KEY)
+        transaction.on_commit(
+            lambda: backfill_executor.submit(backfill_in_background, author_id)
+        )
+
+
+def get_feed_ids(request, before, limit):
+    feed = FeedItem.objects.filter(user=request.user)
+    if before is not None:
+        feed = feed.filter(recipe_id__lt=before)
+    sources = [
+        feed.order_by('-recipe_id').values_list('recipe_id', flat=True)
+    ]
+    for author_id in get_popular_author_ids() & get_author_ids(request):
+        recipes = Recipe.objects.filter(author_id=author_id)
+        if before is not None:
+            recipes = recipes.filter(id__lt=before)
+        sources.append(recipes.order_by('-id').values_list('id', flat=True))
+    merged = heapq.merge(
+        *(source[:limit] for source in sources), reverse=True
+    )
+    return list(islice((pk for pk, _ in groupby(merged)), limit))
+
+
+def get_feed_recipes(recipe_ids):
+    recipes = Recipe.objects.select_related('author').in_bulk(recipe_ids)
+    return [recipes[pk] for pk in recipe_ids if pk in recipes]
@@ -1,14 +1,50 @@
 import base64
+import binascii
 
+from django.conf import settings
 from django.core.files.base import ContentFile
+from PIL import Image
 from rest_framework import serializers
 
 
+def check_dimensions(file):
+    try:
+        width, height = Image.open(file).size
+    except Exception:
+        raise serializers.ValidationError('Загрузите корректное изображение')
+    finally:
+        file.seek(0)
+    if max(width, height) > settings.MAX_IMAGE_DIMENSION:
+        raise serializers.ValidationError(
+            'Изображение больше {0}x{0} пикселей'.format(
+                settings.MAX_IMAGE_DIMENSION
+            )
+        )
+
+
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            try:
+                format, imgstr = data.split(';base64,')
+            except ValueError:
+                raise serializers.ValidationError(
+                    'Загрузите корректное изображение'
+                )
+            if len(imgstr) > settings.MAX_IMAGE_SIZE * 4 / 3 + 4:
+                raise serializers.ValidationError('Файл слишком большой')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='recipe.' + ext)
+            try:
+                data = ContentFile(
+                    base64.b64decode(imgstr), name='recipe.' + ext
+                )
+            except binascii.Error:
+                raise serializers.ValidationError(
+                    'Загрузите корректное изображение'
+                )
+        if getattr(data, 'size', 0) > settings.MAX_IMAGE_SIZE:
+            raise serializers.ValidationError('Файл слишком большой')
+        if hasattr(data, 'seek'):
+            check_dimensions(data)
 
         return super().to_internal_value(data)
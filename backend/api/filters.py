@@ -1,13 +1,22 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connection
+from django.db.models import Q
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from api.cache import get_recipe_ids
+from api.catalogs import tag_catalog
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def get_tag_choices():
+    return tag_catalog.slug_choices()
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug', to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -17,18 +26,54 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('tags', 'author')
 
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(tags__in=tag_catalog.get_ids(value)).distinct()
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(
+                id__in=get_recipe_ids(self.request, Favorite)
+            )
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(
+                id__in=get_recipe_ids(self.request, ShoppingCart)
+            )
         return queryset
 
 
 class IngredientSearch(SearchFilter):
     search_param = 'name'
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return queryset.filter(name__istartswith=name)
+        return queryset.filter(
+            Q(name__istartswith=name) | Q(name__trigram_similar=name)
+        ).annotate(
+            similarity=TrigramSimilarity('name', name)
+        ).order_by('-similarity', 'name')
+
+
+class RecipeSearch(SearchFilter):
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=text) | Q(text__icontains=text)
+            )
+        vector = SearchVector('name', 'text', config='russian')
+        query = SearchQuery(text, config='russian', search_type='websearch')
+        return queryset.alias(search=vector).filter(search=query).annotate(
+            rank=SearchRank(vector, query)
+        ).order_by('-rank', '-id')
@@ -0,0 +1,121 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, storages
+from django.db import connection
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from api.cache import RECIPE, RECIPES, USER, USERS, bump_versions
+from recipes.models import Recipe
+
+User = get_user_model()
+
+VARIANT_SOURCES = (
+    (Recipe, 'image', RECIPE, RECIPES),
+    (User, 'avatar', USER, USERS),
+)
+
+logger = logging.getLogger(__name__)
+
+variant_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_VARIANT_WORKERS,
+    thread_name_prefix='image-variants'
+)
+
+
+def get_variant_name(name, variant):
+    return '{}_{}.webp'.format(os.path.splitext(name)[0], variant)
+
+
+def generate_variants(name, force=False):
+    pending = {
+        variant: get_variant_name(name, variant)
+        for variant in settings.IMAGE_VARIANTS
+    }
+    variant_storage = storages['variants']
+    if not force:
+        pending = {
+            variant: variant_name for variant, variant_name in pending.items()
+            if not variant_storage.exists(variant_name)
+        }
+    if not pending:
+        mark_variants(name)
+        return 0
+    with default_storage.open(name) as image_file:
+        image = ImageOps.exif_transpose(Image.open(image_file))
+        has_alpha = (
+            'A' in image.getbands() or 'transparency' in image.info
+        )
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    for variant, variant_name in pending.items():
+        size = settings.IMAGE_VARIANTS[variant]
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        buffer = BytesIO()
+        thumbnail.save(
+            buffer, 'WEBP', quality=settings.IMAGE_VARIANT_QUALITY
+        )
+        if variant_storage.exists(variant_name):
+            variant_storage.delete(variant_name)
+        variant_storage.save(variant_name, ContentFile(buffer.getvalue()))
+    mark_variants(name)
+    return len(pending)
+
+
+def mark_variants(name):
+    for model, field, version_name, list_version_name in VARIANT_SOURCES:
+        marker = f'{field}_variants_source'
+        pks = list(model.objects.filter(**{field: name}).exclude(
+            **{marker: name}
+        ).values_list('pk', flat=True))
+        if pks:
+            model.objects.filter(pk__in=pks).update(**{marker: name})
+            bump_versions(version_name, *pks)
+            bump_versions(list_version_name, 0)
+
+
+def generate_in_background(name):
+    try:
+        return generate_variants(name)
+    except Exception:
+        logger.exception('Failed to generate variants for %s', name)
+        return 0
+    finally:
+        connection.close()
+
+
+def schedule_variants(name):
+    return variant_executor.submit(generate_in_background, name)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image:
+            return None
+        ready = getattr(
+            instance, f'{self.image_field}_variants_source'
+        ) == image.name
+        request = self.context.get('request')
+        variant_storage = storages['variants']
+        urls = {}
+        for variant in settings.IMAGE_VARIANTS:
+            url = (
+                variant_storage.url(get_variant_name(image.name, variant))
+                if ready else image.url
+            )
+            urls[variant] = (
+                request.build_absolute_uri(url) if request is not None
+                else url
+            )
+        return urls
@@ -1,7 +1,86 @@
-from rest_framework.pagination import PageNumberPagination
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import (CursorPagination, PageNumberPagination,
+                                       replace_query_param)
+from rest_framework.response import Response
+
+
+class CachedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        try:
+            query = str(self.object_list.query).encode()
+        except EmptyResultSet:
+            return 0
+        key = f'pagination:count:{md5(query).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+        return count
+
+
+class CustomCursorPagination(CursorPagination):
+
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = '-id'
+
+
+class FeedPagination(CustomCursorPagination):
+
+    cursor_query_param = 'before'
+
+    def get_cursor(self, request):
+        try:
+            return int(request.query_params[self.cursor_query_param])
+        except (KeyError, ValueError):
+            return None
+
+    def paginate_ids(self, get_ids, request):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        ids = get_ids(self.get_cursor(request), page_size + 1)
+        self.next_cursor = ids[page_size - 1] if len(ids) > page_size else None
+        return ids[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
 
 
 class CustomPagination(PageNumberPagination):
 
     page_size_query_param = 'limit'
     page_size = 6
+    max_page_size = settings.MAX_PAGE_SIZE
+    django_paginator_class = CachedCountPaginator
+    mode_query_param = 'pagination'
+    cursor_pagination_class = CustomCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            self.cursor_pagination = self.cursor_pagination_class()
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
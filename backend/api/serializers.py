@@ -1,15 +1,23 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
+from api.cache import (CATALOG, RECIPE, USER, bump_versions, get_author_ids,
+                       get_recipe_ids, get_versions)
+from api.feed import fan_out_recipe
 from api.fields import Base64ImageField
-from api.utils import bulk_create_ingredients
+from api.images import ImageVariantsField
+from api.utils import (bulk_create_ingredients, get_recipe_prefetch,
+                       update_recipe_ingredients)
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag)
-from users.models import Subscribe
+from recipes.utils import refresh_recipe_shopping_lists
 
 User = get_user_model()
 
@@ -35,19 +43,18 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 class CustomUserReadSerializer(UserSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
     avatar = Base64ImageField()
+    avatar_variants = ImageVariantsField('avatar')
 
     class Meta:
         model = User
         fields = (
             'username', 'id', 'email',
-            'first_name', 'last_name', 'is_subscribed', 'avatar'
+            'first_name', 'last_name', 'is_subscribed', 'avatar',
+            'avatar_variants'
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Subscribe.objects.filter(user=user, author=obj).exists()
+        return obj.id in get_author_ids(self.context.get('request'))
 
     def update(self, instance, validated_data):
         instance.avatar = validated_data.get('avatar')
@@ -64,28 +71,43 @@ class SubscribeSerializer(CustomUserReadSerializer):
         model = User
         fields = (
             'username', 'id', 'email', 'first_name',
-            'last_name', 'is_subscribed', 'recipes', 'recipes_count', 'avatar'
+            'last_name', 'is_subscribed', 'recipes', 'recipes_count', 'avatar',
+            'avatar_variants'
         )
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if limit:
+                recipes = recipes[:int(limit)]
         serializer = RecipeShortSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
 class AvatarSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField()
+    avatar_variants = ImageVariantsField('avatar')
 
     class Meta:
         model = User
-        fields = ('avatar',)
+        fields = ('avatar', 'avatar_variants')
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    image = Base64ImageField()
+    image_variants = ImageVariantsField('image')
+
+    class Meta:
+        model = Recipe
+        fields = ('image', 'image_variants')
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -137,29 +159,25 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             })
         if len(value) == 0:
             raise ValidationError('Нужен хотя бы один ингредиент!')
-        ingrediens_list = []
+        ids = [val['id'] for val in value]
+        ingredients = Ingredient.objects.in_bulk(ids)
+        if len(ingredients) != len(set(ids)):
+            raise serializers.ValidationError('Ингредиент не найден!')
+        if len(ingredients) != len(ids):
+            raise ValidationError('Ингредиент не должны повторятся!')
+        if any(val['amount'] <= 0 for val in value):
+            raise ValidationError(
+                'Количество ингредиента должно быть больше 0!'
+            )
         for val in value:
-            try:
-                ingredient = Ingredient.objects.get(id=val['id'])
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError('Ингредиент не найден!')
-            if ingredient in ingrediens_list:
-                raise ValidationError('Ингредиент не должны повторятся!')
-            ingrediens_list.append(ingredient)
-            if val['amount'] <= 0:
-                raise ValidationError(
-                    'Количество ингредиента должно быть больше 0!'
-                )
+            val['ingredient'] = ingredients[val['id']]
         return value
 
     def validate_tags(self, value):
         if len(value) == 0:
             raise ValidationError('Нужен хотя бы один тег!')
-        tag_list = []
-        for val in value:
-            if val in tag_list:
-                raise ValidationError('Тег не должен повторятся!')
-            tag_list.append(val)
+        if len(set(value)) != len(value):
+            raise ValidationError('Тег не должен повторятся!')
         return value
 
     def create(self, validated_data):
@@ -168,16 +186,21 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         bulk_create_ingredients(ingredients, recipe)
+        fan_out_recipe(recipe)
+        transaction.on_commit(lambda: bump_versions(RECIPE, recipe.id))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        bulk_create_ingredients(ingredients, instance)
-        instance.tags.clear()
+        ingredient_ids = update_recipe_ingredients(instance, ingredients)
+        if ingredient_ids:
+            refresh_recipe_shopping_lists(instance.id, ingredient_ids)
         instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        transaction.on_commit(lambda: bump_versions(RECIPE, instance.id))
+        return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
@@ -185,6 +208,17 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return RecipeReadSerializer(instance, context=context).data
 
 
+class RecipeReadListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        fragments = self.child.get_fragments(recipes)
+        return [
+            self.child.add_user_fields(recipe, fragments[recipe.id])
+            for recipe in recipes
+        ]
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     author = CustomUserReadSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
@@ -192,6 +226,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     tags = TagSerializer(many=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
@@ -202,51 +237,94 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'is_favorited',
             'is_in_shopping_cart'
         )
+        list_serializer_class = RecipeReadListSerializer
 
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredient_list__amount')
+    def to_representation(self, instance):
+        fragment = self.get_fragments([instance])[instance.id]
+        return self.add_user_fields(instance, fragment)
+
+    def get_fragments(self, recipes):
+        base_url = self.context.get('request').build_absolute_uri('/')
+        versions = get_versions(
+            (CATALOG, 0),
+            *((RECIPE, recipe.id) for recipe in recipes),
+            *((USER, recipe.author_id) for recipe in recipes),
+        )
+        keys = {
+            recipe.id: 'recipe:fragment:{}:{}:{}:{}:{}:{:d}{:d}'.format(
+                recipe.id,
+                versions[(RECIPE, recipe.id)],
+                versions[(USER, recipe.author_id)],
+                versions[(CATALOG, 0)],
+                base_url,
+                recipe.image_variants_source == recipe.image.name,
+                recipe.author.avatar_variants_source == (
+                    recipe.author.avatar.name
+                ),
+            )
+            for recipe in recipes
+        }
+        fragments = cache.get_many(keys.values())
+        missing = [recipe for recipe in recipes
+                   if keys[recipe.id] not in fragments]
+        if missing:
+            prefetch_related_objects(missing, *get_recipe_prefetch())
+            rendered = {}
+            for recipe in missing:
+                rendered[keys[recipe.id]] = super().to_representation(recipe)
+            cache.set_many(rendered, settings.RECIPE_CACHE_TIMEOUT)
+            fragments.update(rendered)
+        return {recipe_id: fragments[key] for recipe_id, key in keys.items()}
+
+    def add_user_fields(self, instance, fragment):
+        request = self.context.get('request')
+        data = dict(fragment)
+        data['author'] = dict(
+            fragment['author'],
+            is_subscribed=instance.author_id in get_author_ids(request)
         )
-        return ingredients
+        data['is_favorited'] = self.get_is_favorited(instance)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(instance)
+        return data
+
+    def get_ingredients(self, obj):
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in obj.ingredient_list.all()
+        ]
 
     def get_is_favorited(self, instance):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.favorites.filter(recipe=instance).exists()
+        request = self.context.get('request')
+        return instance.id in get_recipe_ids(request, Favorite)
 
     def get_is_in_shopping_cart(self, instance):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.shopping_cart.filter(recipe=instance).exists()
+        request = self.context.get('request')
+        return instance.id in get_recipe_ids(request, ShoppingCart)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Favorite
-        fields = ('id', 'recipe', 'user')
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('id', 'recipe', 'user')
+class RecipeBulkSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.MAX_BULK_IDS
+    )
@@ -0,0 +1,56 @@
+import atexit
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from recipes.models import Recipe
+
+
+class LinkHitCounter:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._hits = Counter()
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+
+    def add(self, recipe_id):
+        with self._lock:
+            self._hits[recipe_id] += 1
+            self._pending += 1
+            due = (
+                self._pending >= settings.LINK_HITS_FLUSH_SIZE
+                or time.monotonic() - self._flushed_at
+                >= settings.LINK_HITS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+        if not hits:
+            return
+        by_count = defaultdict(list)
+        for recipe_id, count in hits.items():
+            by_count[count].append(recipe_id)
+        try:
+            with transaction.atomic():
+                for count, ids in by_count.items():
+                    Recipe.objects.filter(id__in=ids).update(
+                        link_hits=F('link_hits') + count
+                    )
+        except DatabaseError:
+            with self._lock:
+                self._hits.update(hits)
+                self._pending += sum(hits.values())
+
+
+link_hits = LinkHitCounter()
+atexit.register(link_hits.flush)
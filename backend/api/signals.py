@@ -0,0 +1,134 @@
+from threading import local
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from api.cache import (CATALOG, INGREDIENTS, RECIPE, RECIPE_IDS, RECIPES,
+                       STATE, TAGS, USER, USERS, bump_versions,
+                       invalidate_recipe_ids)
+from api.images import schedule_variants
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            RecipeTag, ShoppingCart, ShoppingListItem, Tag)
+from recipes.signals import shopping_list_refreshed
+from recipes.utils import get_ingredient_ids, refresh_shopping_list
+
+User = get_user_model()
+
+pending_carts = local()
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_pre_delete(sender, instance, **kwargs):
+    user_ids = list(instance.shopping_cart.values_list('user_id', flat=True))
+    ingredient_ids = get_ingredient_ids(instance.id)
+    transaction.on_commit(
+        lambda: refresh_shopping_list(user_ids, ingredient_ids)
+    )
+    for model in (Favorite, ShoppingCart):
+        user_ids = list(
+            model.objects.filter(recipe=instance).values_list(
+                'user_id', flat=True
+            )
+        )
+        if user_ids:
+            transaction.on_commit(
+                lambda model=model, user_ids=user_ids: invalidate_recipe_ids(
+                    model, *user_ids
+                )
+            )
+
+
+def bump_on_commit(name, pk):
+    transaction.on_commit(lambda: bump_versions(name, pk))
+
+
+def generate_variants_on_commit(field_file):
+    if field_file:
+        name = field_file.name
+        transaction.on_commit(lambda: schedule_variants(name), robust=True)
+
+
+def touch_recipe(recipe_id):
+    bump_on_commit(RECIPE, recipe_id)
+    bump_on_commit(RECIPES, 0)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    touch_recipe(instance.id)
+    if created:
+        bump_on_commit(RECIPE_IDS, 0)
+    generate_variants_on_commit(instance.image)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    bump_on_commit(RECIPES, 0)
+    bump_on_commit(RECIPE_IDS, 0)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def recipe_relation_changed(sender, instance, **kwargs):
+    touch_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not action.startswith('post_') or pk_set == set():
+        return
+    if reverse:
+        bump_on_commit(CATALOG, 0)
+    else:
+        touch_recipe(instance.id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    bump_on_commit(USER, instance.id)
+    bump_on_commit(USERS, 0)
+    generate_variants_on_commit(instance.avatar)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_on_commit(CATALOG, 0)
+    bump_on_commit(TAGS, 0)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    bump_on_commit(CATALOG, 0)
+    bump_on_commit(INGREDIENTS, 0)
+
+
+def refresh_pending_carts():
+    recipe_ids = {}
+    for user_id, recipe_id in pending_carts.__dict__.pop('rows', set()):
+        recipe_ids.setdefault(user_id, set()).add(recipe_id)
+    for user_id, ids in recipe_ids.items():
+        refresh_shopping_list([user_id], get_ingredient_ids(*ids))
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    pending_carts.__dict__.setdefault('rows', set()).add(
+        (instance.user_id, instance.recipe_id)
+    )
+    transaction.on_commit(refresh_pending_carts)
+
+
+@receiver(shopping_list_refreshed, sender=ShoppingListItem)
+def shopping_list_refreshed_handler(sender, user_ids, **kwargs):
+    transaction.on_commit(lambda: bump_versions(STATE, *user_ids))
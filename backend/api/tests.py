@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+
+class RecipeListQueriesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                password='pass'
+            )
+            for i in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(5)
+        ]
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                author=authors[i % 3], name=f'Рецепт {i}',
+                text='Текст', cooking_time=10
+            )
+            recipe.tags.set(tags[:i % 3 + 1])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1
+                )
+                for ingredient in ingredients
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscribe.objects.create(user=cls.user, author=authors[0])
+
+    def assert_constant_queries(self, num):
+        for limit in (2, 10):
+            cache.clear()
+            with self.assertNumQueries(num):
+                response = self.client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries(4)
+
+    def test_authenticated_list_queries_do_not_grow_with_page_size(self):
+        self.client.force_authenticate(self.user)
+        self.assert_constant_queries(7)
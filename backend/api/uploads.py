@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+
+class UploadTooLarge(MultiPartParserError):
+    pass
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_IMAGE_SIZE:
+            self.file.close()
+            raise UploadTooLarge('Файл слишком большой')
+        return super().receive_data_chunk(raw_data, start)
+
+
+def limit_uploads(request):
+    request._request.upload_handlers = [
+        LimitedUploadHandler(request._request)
+    ]
@@ -1,9 +1,25 @@
-from django.shortcuts import get_object_or_404
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
 
+from api.cache import invalidate_recipe_ids
 from api.error import ValidationError404
-from recipes.models import IngredientInRecipe, Recipe
+from recipes.models import IngredientInRecipe, Recipe, ShoppingCart
+from recipes.utils import get_ingredient_ids, refresh_shopping_list
+
+
+def get_recipe_prefetch():
+    return (
+        'tags',
+        Prefetch(
+            'ingredient_list',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ),
+    )
 
 
 def bulk_create_ingredients(ingredients, recipe):
@@ -13,34 +29,142 @@ def bulk_create_ingredients(ingredients, recipe):
         bulk_list.append(
             IngredientInRecipe(
                 recipe=recipe,
-                ingredient_id=ingredient.get('id'),
+                ingredient=ingredient['ingredient'],
                 amount=ingredient.get('amount'))
         )
     return IngredientInRecipe.objects.bulk_create(bulk_list)
 
 
-def create_or_delete_shopping_favorite(model, request, pk, serial, rs_serial):
+def update_recipe_ingredients(recipe, ingredients):
+    existing = {
+        row.ingredient_id: row for row in recipe.ingredient_list.all()
+    }
+    new = {ingredient['id']: ingredient for ingredient in ingredients}
+    removed = existing.keys() - new.keys()
+    changed = []
+    for ingredient_id, row in existing.items():
+        if ingredient_id in new and row.amount != new[ingredient_id]['amount']:
+            row.amount = new[ingredient_id]['amount']
+            changed.append(row)
+    added = [
+        ingredient for ingredient_id, ingredient in new.items()
+        if ingredient_id not in existing
+    ]
+    if removed:
+        IngredientInRecipe.objects.filter(
+            recipe=recipe, ingredient_id__in=removed
+        ).delete()
+    if changed:
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+    if added:
+        bulk_create_ingredients(added, recipe)
+    return (
+        removed
+        | {row.ingredient_id for row in changed}
+        | {ingredient['id'] for ingredient in added}
+    )
+
+
+def insert_or_ignore(model, **values):
+    quote_name = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in values]
+    sql = 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING RETURNING {}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            quote_name(model._meta.db_table),
+            ', '.join(quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+            quote_name(model._meta.pk.column),
+        ), list(values.values()))
+        return cursor.fetchone() is not None
+
+
+def create_or_delete_shopping_favorite(model, request, pk, rs_serial):
     user = request.user
     if request.method == 'POST':
-        try:
-            recipe = Recipe.objects.get(pk=pk)
-        except Recipe.DoesNotExist:
+        recipe = Recipe.objects.filter(pk=pk).first()
+        if recipe is None:
             raise ValidationError404('Recipe does not exist')
-        if model.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError('Вы уже добавили этот рецепт')
-        data = {
-            'user': request.user.id,
-            'recipe': recipe.id
-        }
-        serializer = serial(data=data)
-        if serializer.is_valid():
-            serializer.save()
-            serializer_recipe = rs_serial(recipe)
-            return Response(serializer_recipe.data, status=201)
-        return Response(serializer.errors, status=400)
-    recipe = get_object_or_404(Recipe, pk=pk)
-    obj = model.objects.filter(user=user, recipe=recipe)
-    if obj.exists():
-        obj.delete()
-        return Response(status=204)
-    raise ValidationError('Вы не добавили этот рецепт')
+        with transaction.atomic():
+            if not insert_or_ignore(model, user=user.id, recipe=recipe.id):
+                raise ValidationError('Вы уже добавили этот рецепт')
+            if model is ShoppingCart:
+                refresh_shopping_list(
+                    [user.id], get_ingredient_ids(recipe.id)
+                )
+        invalidate_recipe_ids(model, user.id)
+        return Response(rs_serial(recipe).data, status=201)
+    deleted, _ = model.objects.filter(user=user, recipe_id=pk).delete()
+    if not deleted:
+        if not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        raise ValidationError('Вы не добавили этот рецепт')
+    invalidate_recipe_ids(model, user.id)
+    return Response(status=204)
+
+
+def bulk_create_or_delete_shopping_favorite(model, request, serial):
+    serializer = serial(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user = request.user
+    recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+    recipes = Recipe.objects.only('id').in_bulk(recipe_ids)
+    existing = set(model.objects.filter(
+        user=user, recipe__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+    if request.method == 'POST':
+        changed = [pk for pk in recipes if pk not in existing]
+        statuses = ('not_found', 'already_added', 'added')
+    else:
+        changed = [pk for pk in recipes if pk in existing]
+        statuses = ('not_found', 'not_added', 'removed')
+    with transaction.atomic():
+        if request.method == 'POST':
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=pk) for pk in changed],
+                ignore_conflicts=True
+            )
+            if model is ShoppingCart:
+                refresh_shopping_list(
+                    [user.id], get_ingredient_ids(*changed)
+                )
+        else:
+            model.objects.filter(user=user, recipe__in=changed).delete()
+    invalidate_recipe_ids(model, user.id)
+    results = []
+    for pk in recipe_ids:
+        if pk not in recipes:
+            result = statuses[0]
+        else:
+            result = statuses[2] if pk in changed else statuses[1]
+        results.append({'id': pk, 'status': result})
+    return Response({'results': results}, status=200)
+
+
+def conditional_response(request, get_response, etag=None):
+    etag = quote_etag(etag) if etag else None
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = get_response()
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def get_quality(params):
+    for param in params.split(';'):
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0
+    return 1
+
+
+def accepts_encoding(request, encoding):
+    qualities = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.partition(';')
+        qualities[name.strip().lower()] = get_quality(params)
+    return qualities.get(encoding, qualities.get('*', 0)) > 0
@@ -1,31 +1,49 @@
+from functools import partial
+from hashlib import md5
+
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Count, Max, Prefetch, prefetch_related_objects
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import baseconv
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.serializers import SetPasswordSerializer
 from djoser.views import UserViewSet
-from rest_framework import filters, serializers, status
+from rest_framework import serializers, status
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.filters import IngredientSearch, RecipeFilter
-from api.pagination import CustomPagination
+from api.cache import (CATALOG, INGREDIENTS, RECIPE, RECIPES, STATE, USER,
+                       USERS, get_versions, invalidate_author_ids)
+from api.catalogs import ingredient_index, recipe_ids, tag_catalog
+from api.exports import EXPORTERS, get_stored_export, store_while_streaming
+from api.feed import (fan_in_author, get_feed_ids, get_feed_recipes,
+                      remove_author)
+from api.filters import IngredientSearch, RecipeFilter, RecipeSearch
+from api.pagination import CustomPagination, FeedPagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.renderers import (CSVRenderer, PassthroughRenderer, PDFRenderer,
+                           PlainTextRenderer)
 from api.serializers import (AvatarSerializer, CustomUserCreateSerializer,
-                             CustomUserReadSerializer, FavoriteSerializer,
-                             IngredientSerializer, RecipeReadSerializer,
-                             RecipeShortSerializer, RecipeWriteSerializer,
-                             ShoppingCartSerializer, SubscribeSerializer,
+                             CustomUserReadSerializer, IngredientSerializer,
+                             RecipeBulkSerializer, RecipeImageSerializer,
+                             RecipeReadSerializer, RecipeShortSerializer,
+                             RecipeWriteSerializer, SubscribeSerializer,
                              TagSerializer)
-from api.utils import create_or_delete_shopping_favorite
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from api.shortlinks import link_hits
+from api.uploads import limit_uploads
+from api.utils import (accepts_encoding,
+                       bulk_create_or_delete_shopping_favorite,
+                       conditional_response,
+                       create_or_delete_shopping_favorite, insert_or_ignore)
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import Subscribe
 
 User = get_user_model()
@@ -36,6 +54,12 @@ class TagViewSet(ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        version, (tags, _) = tag_catalog.get_snapshot()
+        return conditional_response(
+            request, lambda: Response(tags), etag=f'tags-{version}'
+        )
+
 
 class IngridientViewSet(ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -44,14 +68,107 @@ class IngridientViewSet(ReadOnlyModelViewSet):
     filter_backends = (IngredientSearch,)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientSearch.search_param, '')
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else None
+        since = request.query_params.get('since')
+        if since is not None:
+            return Response(ingredient_index.delta(since))
+        if not name and limit is None:
+            return self.catalog_response(request)
+        ingredients = ingredient_index.search(name, limit)
+        if not ingredients and name:
+            queryset = self.filter_queryset(self.get_queryset())[:limit]
+            ingredients = self.get_serializer(queryset, many=True).data
+        return Response(ingredients)
+
+    def catalog_response(self, request):
+        catalog = ingredient_index.get_catalog()
+        compress = accepts_encoding(request, 'gzip')
+        if compress:
+            body, etag = catalog.compressed, f'{catalog.etag}-gzip'
+        else:
+            body, etag = catalog.raw, catalog.etag
+
+        def get_response():
+            response = HttpResponse(body, content_type='application/json')
+            if compress:
+                response['Content-Encoding'] = 'gzip'
+            return response
+
+        response = conditional_response(request, get_response, etag=etag)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
 
 class RecipeViewSet(ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
     pagination_class = CustomPagination
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, RecipeSearch)
     filterset_class = RecipeFilter
-    search_fields = ('tags',)
+    search_fields = ('name', 'text')
+
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'image':
+            limit_uploads(request)
+        return request
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            isinstance(response, Response)
+            and isinstance(response.accepted_renderer, PassthroughRenderer)
+            and not isinstance(response.data, bytes)
+        ):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+        return response
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.select_related('author')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, partial(super().list, request, *args, **kwargs),
+            None, (RECIPES, 0), (USERS, 0)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        retrieve = partial(super().retrieve, request, *args, **kwargs)
+        if not str(kwargs['pk']).isdigit():
+            return retrieve()
+        recipe = Recipe.objects.filter(pk=kwargs['pk']).values(
+            'updated_at', 'author_id'
+        ).first()
+        if recipe is None:
+            return retrieve()
+        return self.conditional_response(
+            request, retrieve, recipe['updated_at'],
+            (RECIPE, int(kwargs['pk'])), (USER, recipe['author_id'])
+        )
+
+    def conditional_response(self, request, get_response, updated_at,
+                             *version_keys):
+        version_keys = [(CATALOG, 0), *version_keys]
+        if request.user.is_authenticated:
+            version_keys.append((STATE, request.user.id))
+        versions = get_versions(*version_keys)
+        etag = md5(repr((
+            request.user.id, request.get_full_path(), updated_at,
+            sorted(versions.items())
+        )).encode()).hexdigest()
+        response = conditional_response(request, get_response, etag=etag)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -65,45 +182,101 @@ class RecipeViewSet(ModelViewSet):
     def shopping_cart(self, request, **kwargs):
         return create_or_delete_shopping_favorite(
             model=ShoppingCart, pk=self.kwargs['pk'],
-            serial=ShoppingCartSerializer,
             request=request, rs_serial=RecipeShortSerializer)
 
-    @action(detail=False, methods=['get'])
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            JSONRenderer, PlainTextRenderer, CSVRenderer, PDFRenderer
+        ),
+    )
     def download_shopping_cart(self, request):
         user = request.user
-        if not user.shopping_cart.exists():
+        cart = user.shopping_cart.aggregate(
+            count=Count('id'), updated_at=Max('recipe__updated_at')
+        )
+        if not cart['count']:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        renderer = request.accepted_renderer
+        if renderer.format not in EXPORTERS:
+            renderer = PlainTextRenderer
+        export_format, content_type = renderer.format, renderer.media_type
+        filename = f'{user.username}_shopping_list.{export_format}'
+        versions = get_versions((STATE, user.id), (INGREDIENTS, 0))
+        cache_key = 'shopping_list:{}:{}:{}:{}:{}:{}'.format(
+            user.id, export_format, cart['count'],
+            cart['updated_at'].timestamp(), versions[(STATE, user.id)],
+            versions[(INGREDIENTS, 0)]
+        )
+        stored = get_stored_export(cache_key)
+        if stored is not None:
+            return FileResponse(
+                stored, as_attachment=True,
+                filename=filename, content_type=content_type
+            )
 
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
+        ingredients = user.shopping_list.values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount'))
-
-        shopping_list = (
-            f'Список покупок для: {user.get_full_name()}\n\n'
+            'ingredient__measurement_unit',
+            'total_amount'
+        ).order_by('ingredient__name').iterator(chunk_size=2000)
+        chunks = store_while_streaming(
+            EXPORTERS[export_format](user, ingredients),
+            f'shopping_lists/{user.id}/{filename}', cache_key
         )
-        shopping_list += '\n'.join([
-            f'- {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["total_amount"]}'
-            for ingredient in ingredients
-        ])
-
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        response = StreamingHttpResponse(chunks, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
-
         return response
 
+    @action(
+        detail=False, methods=['get'], permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_ids(
+            partial(get_feed_ids, request), request
+        )
+        serializer = RecipeReadSerializer(
+            get_feed_recipes(recipe_ids), many=True,
+            context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['put'])
+    def image(self, request, **kwargs):
+        recipe = self.get_object()
+        serializer = RecipeImageSerializer(
+            recipe, data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=200)
+
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, **kwargs):
         return create_or_delete_shopping_favorite(
             model=Favorite, pk=self.kwargs['pk'],
-            serial=FavoriteSerializer,
             request=request, rs_serial=RecipeShortSerializer)
 
+    @action(
+        detail=False, methods=['post', 'delete'], url_path='favorite/bulk'
+    )
+    def favorite_bulk(self, request):
+        return bulk_create_or_delete_shopping_favorite(
+            Favorite, request, RecipeBulkSerializer
+        )
+
+    @action(
+        detail=False, methods=['post', 'delete'],
+        url_path='shopping_cart/bulk'
+    )
+    def shopping_cart_bulk(self, request):
+        return bulk_create_or_delete_shopping_favorite(
+            ShoppingCart, request, RecipeBulkSerializer
+        )
+
     @action(
         methods=['get'],
         detail=True,
@@ -111,8 +284,9 @@ class RecipeViewSet(ModelViewSet):
         url_name='get-link',
     )
     def get_link(self, request, pk=None):
-        recipe = self.get_object()
-        encode_id = baseconv.base64.encode(recipe.id)
+        if not pk.isdigit() or int(pk) not in recipe_ids:
+            raise Http404
+        encode_id = baseconv.base64.encode(int(pk))
         short_link = request.build_absolute_uri(
             reverse('shortlink', kwargs={'encoded_id': encode_id})
         )
@@ -128,6 +302,12 @@ class ShortLinkView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         recipe_id = baseconv.base64.decode(encoded_id)
+        if recipe_id not in recipe_ids:
+            return Response(
+                {'error': 'Рецепт не найден.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        link_hits.add(recipe_id)
         return redirect(f'/recipes/{recipe_id}/',)
 
 
@@ -147,6 +327,12 @@ class CustomUserViewSet(UserViewSet):
         if self.action == 'subscribe':
             return SubscribeSerializer
 
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'avatar':
+            limit_uploads(request)
+        return request
+
     def get_permissions(self):
         if self.action in ('list', 'create', 'retrieve'):
             self.permission_classes = [AllowAny, ]
@@ -155,34 +341,47 @@ class CustomUserViewSet(UserViewSet):
     @action(methods=['post', 'delete'], detail=True)
     def subscribe(self, request, **kwargs):
         user = request.user
-        author = get_object_or_404(User, id=self.kwargs['id'])
         if request.method == 'POST':
-            if Subscribe.objects.filter(user=user, author=author).exists():
-                raise serializers.ValidationError(
-                    'Вы уже подписаны на этого автора', code=400
-                )
+            author = get_object_or_404(User, id=self.kwargs['id'])
             if user == author:
                 raise serializers.ValidationError(
                     'Нельзя подписаться на самого себя', code=400
                 )
+            if not insert_or_ignore(Subscribe, user=user.id, author=author.id):
+                raise serializers.ValidationError(
+                    'Вы уже подписаны на этого автора', code=400
+                )
+            fan_in_author(user.id, author.id)
+            invalidate_author_ids(user.id)
             serializer = SubscribeSerializer(
                 author,
                 context={"request": request, }
             )
-            Subscribe.objects.create(user=user, author=author)
             return Response(serializer.data, status=201)
-        try:
-            subscribe = Subscribe.objects.get(user=user, author=author)
-            subscribe.delete()
-        except Subscribe.DoesNotExist:
+        deleted, _ = Subscribe.objects.filter(
+            user=user, author_id=self.kwargs['id']
+        ).delete()
+        if not deleted:
+            get_object_or_404(User, id=self.kwargs['id'])
             raise serializers.ValidationError('Not Found', code=400)
+        remove_author(user.id, self.kwargs['id'])
+        invalidate_author_ids(user.id)
         return Response(status=204)
 
     @action(methods=['get', ], detail=False,)
     def subscriptions(self, request, **kwargs):
         user = request.user
-        queryset = User.objects.filter(subscribed__user=user)
+        queryset = User.objects.filter(subscribed__user=user).annotate(
+            recipes_count=Count('recipes')
+        )
         pages = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.order_by('id')
+        limit = request.query_params.get('recipes_limit')
+        if limit:
+            recipes = recipes[:int(limit)]
+        prefetch_related_objects(pages, Prefetch(
+            'recipes', queryset=recipes, to_attr='limited_recipes'
+        ))
         serializer = SubscribeSerializer(
             pages, many=True, context={"request": request}
         )
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'colorfield',
     'rest_framework.authtoken',
     'rest_framework',
@@ -106,6 +107,36 @@ DATABASES = {
 # }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+MAX_PAGE_SIZE = 100
+
+MAX_BULK_IDS = int(os.getenv('MAX_BULK_IDS', 100))
+
+PAGINATION_COUNT_TIMEOUT = 30
+
+INGREDIENT_CATALOG_HISTORY = 10
+
+CATALOG_STAMP_INTERVAL = 60
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+SHOPPING_LIST_CHUNK_SIZE = 64 * 1024
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -177,8 +208,50 @@ MEDIA_URL = '/media/'
 
 RECIPE_REDIRECT = 'recipes/'
 
+LINK_HITS_FLUSH_SIZE = 100
+
+LINK_HITS_FLUSH_INTERVAL = 60
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+
+FEED_BACKFILL_SIZE = 50
+
+FEED_FANOUT_BATCH_SIZE = 1000
+
+FEED_POPULAR_AUTHORS_TIMEOUT = 60 * 5
+
+FEED_BACKFILL_WORKERS = int(os.getenv('FEED_BACKFILL_WORKERS', 1))
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+EXPORTS_ROOT = os.path.join(BASE_DIR, 'exports')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'variants': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'exports': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': EXPORTS_ROOT},
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 10 * 1024 * 1024))
+
+MAX_IMAGE_DIMENSION = int(os.getenv('MAX_IMAGE_DIMENSION', 4096))
+
+IMAGE_VARIANTS = {'small': 160, 'medium': 480, 'large': 1024}
+
+IMAGE_VARIANT_QUALITY = 80
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
 CSV_FILE_DIR = os.path.join(BASE_DIR, 'ingredients')
 
 CSRF_TRUSTED_ORIGINS = ['https://foodgram-slava.zapto.org']
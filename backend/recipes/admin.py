@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            RecipeTag, ShoppingCart, Tag)
+from recipes.models import (Favorite, FeedItem, Ingredient, IngredientInRecipe,
+                            Recipe, RecipeTag, ShoppingCart, ShoppingListItem,
+                            Tag)
+from recipes.utils import refresh_recipe_shopping_lists
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -13,7 +15,9 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'get_tags', 'get_favorites')
+    list_display = (
+        'id', 'name', 'author', 'get_tags', 'get_favorites', 'link_hits'
+    )
     list_filter = ('author', 'name', 'tags')
     search_fields = ('name',)
 
@@ -37,6 +41,22 @@ class RecipeTagAdmin(admin.ModelAdmin):
 class IngredientInRecipeAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
 
+    def save_model(self, request, obj, form, change):
+        ingredient_ids = {obj.ingredient_id, form.initial.get('ingredient')}
+        ingredient_ids.discard(None)
+        super().save_model(request, obj, form, change)
+        refresh_recipe_shopping_lists(obj.recipe_id, ingredient_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_recipe_shopping_lists(obj.recipe_id, [obj.ingredient_id])
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('recipe_id', 'ingredient_id'))
+        super().delete_queryset(request, queryset)
+        for recipe_id, ingredient_id in rows:
+            refresh_recipe_shopping_lists(recipe_id, [ingredient_id])
+
 
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
@@ -46,6 +66,14 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
 
 
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'total_amount')
+
+
+class FeedItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipe')
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
@@ -53,3 +81,5 @@ admin.site.register(RecipeTag, RecipeTagAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
+admin.site.register(FeedItem, FeedItemAdmin)
@@ -0,0 +1,166 @@
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.utils import batched
+
+User = get_user_model()
+
+MEDIA_DIRS = ('recipes/images', 'users/images')
+
+
+class RateLimiter:
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def is_referenced_in_db(name, root=None):
+    if root is not None:
+        return (
+            Recipe.objects.filter(image__startswith=f'{root}.').exists()
+            or User.objects.filter(avatar__startswith=f'{root}.').exists()
+        )
+    return (
+        Recipe.objects.filter(image=name).exists()
+        or User.objects.filter(avatar=name).exists()
+    )
+
+
+class Command(BaseCommand):
+    help = 'Deletes media files no longer referenced by recipes or users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report orphaned files'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of threads checking files'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=50,
+            help='Maximum deletions per second, 0 for no limit'
+        )
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help='Skip files modified within this many minutes'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of referenced paths fetched at once'
+        )
+
+    def get_referenced(self, chunk_size):
+        names = set()
+        querysets = (
+            Recipe.objects.values_list('image', flat=True),
+            User.objects.values_list('avatar', flat=True),
+        )
+        for queryset in querysets:
+            names.update(
+                name for name in queryset.order_by().iterator(
+                    chunk_size=chunk_size
+                ) if name
+            )
+        return names, {os.path.splitext(name)[0] for name in names}
+
+    def get_source_root(self, name):
+        match = self.variant_pattern.match(name)
+        return match.group(1) if match else None
+
+    def is_referenced(self, name):
+        return (
+            name in self.referenced
+            or self.get_source_root(name) in self.referenced_roots
+        )
+
+    def is_recent(self, path):
+        try:
+            return os.stat(path).st_mtime > self.cutoff
+        except FileNotFoundError:
+            return True
+
+    def collect(self, directory, entries):
+        stats = Counter()
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            name = f'{directory}/{entry.name}'
+            if self.is_referenced(name):
+                stats['referenced'] += 1
+                continue
+            if entry.stat().st_mtime > self.cutoff:
+                stats['recent'] += 1
+                continue
+            if is_referenced_in_db(name, self.get_source_root(name)):
+                stats['referenced'] += 1
+                continue
+            if not self.dry_run:
+                self.limiter.wait()
+                if self.is_recent(entry.path):
+                    stats['recent'] += 1
+                    continue
+            stats['orphaned'] += 1
+            stats['bytes'] += entry.stat().st_size
+            if self.dry_run:
+                self.stdout.write(f'Не используется: {name}')
+                continue
+            default_storage.delete(name)
+            self.stdout.write(f'Удалён: {name}')
+        return stats
+
+    def handle(self, *args, **kwargs):
+        self.dry_run = kwargs['dry_run']
+        self.limiter = RateLimiter(kwargs['rate'])
+        self.cutoff = time.time() - kwargs['grace'] * 60
+        self.variant_pattern = re.compile(r'^(.*)_({})\.webp$'.format(
+            '|'.join(map(re.escape, settings.IMAGE_VARIANTS))
+        ))
+        self.referenced, self.referenced_roots = self.get_referenced(
+            kwargs['chunk_size']
+        )
+        stats = Counter()
+        workers = kwargs['workers']
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for directory in MEDIA_DIRS:
+                path = default_storage.path(directory)
+                if not os.path.isdir(path):
+                    continue
+                with os.scandir(path) as entries:
+                    for group in batched(batched(entries, 500), workers):
+                        for result in executor.map(
+                            lambda batch: self.collect(directory, batch),
+                            group
+                        ):
+                            stats.update(result)
+        self.stdout.write(self.style.SUCCESS(
+            '{}: {}, освобождено байт: {}, используется: {}, '
+            'пропущено новых: {}'.format(
+                'Найдено' if self.dry_run else 'Удалено',
+                stats['orphaned'], stats['bytes'],
+                stats['referenced'], stats['recent'],
+            )
+        ))
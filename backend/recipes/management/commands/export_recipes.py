@@ -0,0 +1,68 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import IngredientInRecipe, Recipe
+
+
+def serialize_recipe(recipe):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name or None,
+        'author': recipe.author.username,
+        'author_email': recipe.author.email,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': row.ingredient.name,
+                'measurement_unit': row.ingredient.measurement_unit,
+                'amount': row.amount,
+            }
+            for row in recipe.ingredient_list.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Exports recipes as JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', type=str, nargs='?', default='-',
+            help='The path to the output file, stdout by default'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of recipes fetched from the cursor at once'
+        )
+
+    def handle(self, *args, **kwargs):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_list',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        ).order_by('id')
+        path = kwargs['path']
+        output = (
+            sys.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8')
+        )
+        exported = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=kwargs['chunk_size']):
+                output.write(json.dumps(
+                    serialize_recipe(recipe), ensure_ascii=False
+                ) + '\n')
+                exported += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(f'Выгружено рецептов: {exported}')
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from recipes.models import Recipe
+from recipes.utils import batched
+
+User = get_user_model()
+
+
+def get_image_names():
+    querysets = (
+        Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image', flat=True),
+        User.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        .values_list('avatar', flat=True),
+    )
+    for queryset in querysets:
+        yield from queryset.order_by().distinct().iterator(chunk_size=2000)
+
+
+class Command(BaseCommand):
+    help = 'Generates thumbnail variants for existing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of images processed in parallel'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate variants that already exist'
+        )
+
+    def handle(self, *args, **kwargs):
+        processed = generated = failed = 0
+        workers = kwargs['workers']
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch in batched(get_image_names(), workers * 50):
+                futures = {
+                    executor.submit(
+                        generate_variants, name, kwargs['force']
+                    ): name
+                    for name in batch
+                }
+                for future in as_completed(futures):
+                    try:
+                        generated += future.result()
+                    except Exception as err:
+                        failed += 1
+                        self.stderr.write(
+                            f'Ошибка в {futures[future]}: {err}'
+                        )
+                processed += len(batch)
+                self.stdout.write(f'Обработано изображений: {processed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {processed}, создано вариантов: {generated}, '
+            f'ошибок: {failed}'
+        ))
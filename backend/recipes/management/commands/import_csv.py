@@ -1,34 +1,66 @@
 import csv
+import json
 
 from django.core.management.base import BaseCommand
 
+from api.cache import CATALOG, INGREDIENTS, bump_versions
 from recipes.models import Ingredient
+from recipes.utils import batched
+
+FIELDS = ('name', 'measurement_unit')
+
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8') as csv_file:
+        for row in csv.reader(csv_file):
+            if tuple(value.strip() for value in row) == FIELDS:
+                continue
+            yield row
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as json_file:
+        for item in json.load(json_file):
+            yield [item.get(field) for field in FIELDS]
 
 
 class Command(BaseCommand):
-    help = 'Imports data from a CSV file into MyModel'
+    help = 'Imports ingredients from a CSV or JSON file'
 
     def add_arguments(self, parser):
         parser.add_argument(
-            'csv_file', type=str, help='The path to the CSV file to import'
+            'path', type=str,
+            help='The path to the CSV or JSON file to import'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows inserted per query'
         )
 
+    def parse(self, rows):
+        for row in rows:
+            if len(row) < 2 or not all(row[:2]):
+                self.stderr.write(f'Ошибка в строке {row}: нет данных')
+                self.errors += 1
+                continue
+            name, measurement_unit = (value.strip() for value in row[:2])
+            yield Ingredient(name=name, measurement_unit=measurement_unit)
+
     def handle(self, *args, **kwargs):
-        path = kwargs['csv_file']
-        with open(path, "r") as csv_file:
-            reader = csv.reader(csv_file)
-
-            for row in reader:
-                name_csv = 0
-                unit_of_measurement_csv = 1
-                try:
-                    obj, created = Ingredient.objects.get_or_create(
-                        name=row[name_csv],
-                        measurement_unit=row[unit_of_measurement_csv],
-                    )
-                    if not created:
-                        print(f"Ингредиент {obj} уже tcnm в базе данных.")
-                except Exception as err:
-                    print(f"Ошибка в строке {row}: {err}")
-
-        print("Данные успешно загружены в модель. Кто молодец? :)")
+        path = kwargs['path']
+        reader = read_json if path.endswith('.json') else read_csv
+        self.errors = processed = 0
+        before = Ingredient.objects.count()
+        for batch in batched(self.parse(reader(path)), kwargs['batch_size']):
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+            self.stdout.write(f'Обработано строк: {processed}')
+        inserted = Ingredient.objects.count() - before
+        if inserted:
+            bump_versions(CATALOG, 0)
+            bump_versions(INGREDIENTS, 0)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, '
+            f'пропущено (уже в базе): {processed - inserted}, '
+            f'ошибок: {self.errors}'
+        ))
@@ -0,0 +1,200 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import RECIPE_IDS, RECIPES, bump_versions
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe, RecipeTag,
+                            Tag)
+from recipes.utils import batched
+
+User = get_user_model()
+
+INGREDIENT_FIELDS = {'name', 'measurement_unit', 'amount'}
+MAX_SMALL_INT = 32767
+
+
+def check_text(value, field, max_length=None):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f'{field} должен быть непустой строкой')
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f'{field} длиннее {max_length} символов')
+    return value
+
+
+def check_small_int(value, field):
+    if isinstance(value, bool):
+        raise ValueError(f'{field} должен быть целым числом')
+    value = int(value)
+    if not 1 <= value <= MAX_SMALL_INT:
+        raise ValueError(f'{field} должен быть от 1 до {MAX_SMALL_INT}')
+    return value
+
+
+def is_list_of(value, kind):
+    return isinstance(value, list) and all(
+        isinstance(item, kind) for item in value
+    )
+
+
+def check_record(record):
+    if not isinstance(record, dict):
+        raise ValueError('ожидается JSON-объект')
+    for field in ('author', 'author_email'):
+        if not isinstance(record.get(field, ''), str):
+            raise ValueError(f'{field} должен быть строкой')
+    if not is_list_of(record['tags'], str):
+        raise ValueError('tags должен быть списком строк')
+    ingredients = record['ingredients']
+    if not is_list_of(ingredients, dict) or any(
+        not INGREDIENT_FIELDS <= row.keys()
+        or not isinstance(row['name'], str)
+        or not isinstance(row['measurement_unit'], str)
+        for row in ingredients
+    ):
+        raise ValueError(
+            'ingredients должен быть списком объектов '
+            'с полями name, measurement_unit и amount'
+        )
+
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8') as jsonl_file:
+        for number, line in enumerate(jsonl_file, 1):
+            if line.strip():
+                yield number, line
+
+
+class Command(BaseCommand):
+    help = 'Imports recipes from a JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', type=str,
+            help='The path to the JSON Lines file to import'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of recipes created per transaction'
+        )
+
+    def get_lookups(self, records):
+        usernames = {record.get('author') for record in records}
+        emails = {record.get('author_email') for record in records}
+        slugs = {slug for record in records for slug in record['tags']}
+        names = {
+            row['name'] for record in records
+            for row in record['ingredients']
+        }
+        authors = {}
+        for user in User.objects.filter(email__in=emails - {None}):
+            authors[user.email] = user
+        for user in User.objects.filter(username__in=usernames - {None}):
+            authors[user.username] = user
+        tags = dict(
+            Tag.objects.filter(slug__in=slugs).values_list('slug', 'id')
+        )
+        ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in=names
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+        return authors, tags, ingredients
+
+    def build(self, record, authors, tags, ingredients):
+        author = (
+            authors.get(record.get('author'))
+            or authors.get(record.get('author_email'))
+        )
+        if author is None:
+            raise ValueError('автор не найден')
+        if not record['tags'] or not record['ingredients']:
+            raise ValueError('нужны теги и ингредиенты')
+        name = check_text(
+            record['name'], 'name', Recipe._meta.get_field('name').max_length
+        )
+        text = check_text(record['text'], 'text')
+        cooking_time = check_small_int(record['cooking_time'], 'cooking_time')
+        image = record.get('image')
+        if image is not None:
+            check_text(
+                image, 'image', Recipe._meta.get_field('image').max_length
+            )
+        missing = set(record['tags']) - tags.keys()
+        if missing:
+            raise ValueError(f'теги не найдены: {sorted(missing)}')
+        tag_ids = {tags[slug] for slug in record['tags']}
+        amounts = {}
+        for row in record['ingredients']:
+            key = (row['name'], row['measurement_unit'])
+            if key not in ingredients:
+                raise ValueError(f'ингредиент не найден: {key}')
+            amounts[ingredients[key]] = check_small_int(
+                row['amount'], f'amount {key}'
+            )
+        recipe = Recipe(
+            author=author,
+            name=name,
+            text=text,
+            cooking_time=cooking_time,
+            image=image,
+        )
+        return recipe, tag_ids, amounts
+
+    def parse(self, lines):
+        records = []
+        for number, line in lines:
+            try:
+                record = json.loads(line)
+                check_record(record)
+            except (ValueError, KeyError, TypeError) as err:
+                self.report(number, err)
+                continue
+            records.append((number, record))
+        return records
+
+    def report(self, number, err):
+        self.stderr.write(f'Ошибка в строке {number}: {err}')
+        self.skipped += 1
+
+    @transaction.atomic
+    def import_batch(self, lines):
+        records = self.parse(lines)
+        lookups = self.get_lookups([record for _, record in records])
+        built = []
+        for number, record in records:
+            try:
+                built.append(self.build(record, *lookups))
+            except (ValueError, KeyError, TypeError) as err:
+                self.report(number, err)
+        recipes = Recipe.objects.bulk_create(
+            [recipe for recipe, _, _ in built]
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id)
+            for recipe, (_, tag_ids, _) in zip(recipes, built)
+            for tag_id in tag_ids
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for recipe, (_, _, amounts) in zip(recipes, built)
+            for ingredient_id, amount in amounts.items()
+        )
+        return len(recipes)
+
+    def handle(self, *args, **kwargs):
+        self.skipped = imported = 0
+        lines = read_lines(kwargs['path'])
+        for batch in batched(lines, kwargs['batch_size']):
+            imported += self.import_batch(batch)
+            self.stdout.write(f'Загружено рецептов: {imported}')
+        if imported:
+            bump_versions(RECIPES, 0)
+            bump_versions(RECIPE_IDS, 0)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {imported}, пропущено: {self.skipped}'
+        ))
@@ -0,0 +1,60 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models.functions import Cast, Upper
+
+INGREDIENT_INDEXES = (
+    models.Index(
+        OpClass(
+            Upper(Cast('name', output_field=models.TextField())),
+            name='text_pattern_ops',
+        ),
+        name='ingredient_name_prefix_idx',
+    ),
+    GinIndex(
+        fields=['name'],
+        opclasses=['gin_trgm_ops'],
+        name='ingredient_name_trgm_idx',
+    ),
+)
+
+RECIPE_INDEXES = (
+    GinIndex(
+        SearchVector('name', 'text', config='russian'),
+        name='recipe_search_vector_idx',
+    ),
+)
+
+
+def create_indexes(apps, schema_editor):
+    # Индексы только для PostgreSQL, на SQLite поиск работает без них.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in INGREDIENT_INDEXES:
+        schema_editor.add_index(apps.get_model('recipes', 'Ingredient'), index)
+    for index in RECIPE_INDEXES:
+        schema_editor.add_index(apps.get_model('recipes', 'Recipe'), index)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in INGREDIENT_INDEXES:
+        schema_editor.remove_index(
+            apps.get_model('recipes', 'Ingredient'), index
+        )
+    for index in RECIPE_INDEXES:
+        schema_editor.remove_index(apps.get_model('recipes', 'Recipe'), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_alter_ingredientinrecipe_ingredient_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
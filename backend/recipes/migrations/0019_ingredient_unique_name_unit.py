@@ -0,0 +1,62 @@
+# Generated by Django 4.2.11 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+def merge_rows(model, field, keep_id, dupe_ids, amount_field):
+    rows = model.objects.filter(**{f'{field}__in': dupe_ids})
+    for row in rows:
+        owner = {
+            name: getattr(row, name)
+            for name in ('recipe_id', 'user_id') if hasattr(row, name)
+        }
+        kept = model.objects.filter(**{field: keep_id}, **owner).first()
+        if kept is None:
+            setattr(row, field, keep_id)
+            row.save(update_fields=[field])
+        else:
+            setattr(
+                kept, amount_field,
+                getattr(kept, amount_field) + getattr(row, amount_field)
+            )
+            kept.save(update_fields=[amount_field])
+            row.delete()
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1)
+    for group in duplicates:
+        dupe_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        merge_rows(IngredientInRecipe, 'ingredient_id', group['keep_id'],
+                   dupe_ids, 'amount')
+        merge_rows(ShoppingListItem, 'ingredient_id', group['keep_id'],
+                   dupe_ids, 'total_amount')
+        Ingredient.objects.filter(id__in=dupe_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0018_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_unit'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, default=None, null=True, upload_to='recipes/images/', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='link_hits',
+            field=models.PositiveIntegerField(default=0, verbose_name='Переходы по короткой ссылке'),
+        ),
+    ]
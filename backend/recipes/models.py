@@ -30,6 +30,10 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'measurement_unit'],
+                                    name='unique_ingredient_unit')
+        ]
 
     def __str__(self):
         return self.name
@@ -59,17 +63,32 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         blank=True, null=True,
         default=None,
+        db_index=True,
         verbose_name='Изображение'
     )
+    image_variants_source = models.CharField(
+        max_length=100, blank=True, default='', editable=False,
+        verbose_name='Изображение, для которого созданы миниатюры'
+    )
     text = models.TextField(verbose_name='Текст',)
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=[MinValueValidator(1)],
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name='Дата изменения'
+    )
+    link_hits = models.PositiveIntegerField(
+        default=0, verbose_name='Переходы по короткой ссылке'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='recipe_author_id_idx')
+        ]
 
 
 class RecipeTag(models.Model):
@@ -149,3 +168,52 @@ class Favorite(models.Model):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique_user_recipe_favorite')
         ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique_user_ingredient_shopping')
+        ]
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='unique_user_recipe_feed')
+        ]
@@ -0,0 +1,3 @@
+from django.dispatch import Signal
+
+shopping_list_refreshed = Signal()
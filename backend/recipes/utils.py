@@ -0,0 +1,61 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+from recipes.signals import shopping_list_refreshed
+
+User = get_user_model()
+
+
+def lock_users(user_ids):
+    return list(User.objects.select_for_update().filter(
+        pk__in=user_ids
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def refresh_shopping_list(user_ids, ingredient_ids):
+    user_ids, ingredient_ids = list(user_ids), list(ingredient_ids)
+    if not user_ids or not ingredient_ids:
+        return
+    totals = IngredientInRecipe.objects.filter(
+        recipe__shopping_cart__user__in=user_ids,
+        ingredient__in=ingredient_ids
+    ).values('recipe__shopping_cart__user', 'ingredient').annotate(
+        total=Sum('amount')
+    )
+    with transaction.atomic():
+        lock_users(user_ids)
+        ShoppingListItem.objects.filter(
+            user__in=user_ids, ingredient__in=ingredient_ids
+        ).delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=row['recipe__shopping_cart__user'],
+                ingredient_id=row['ingredient'],
+                total_amount=row['total'],
+            )
+            for row in totals
+        )
+    shopping_list_refreshed.send(sender=ShoppingListItem, user_ids=user_ids)
+
+
+def refresh_recipe_shopping_lists(recipe_id, ingredient_ids):
+    user_ids = ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        'user_id', flat=True
+    )
+    refresh_shopping_list(user_ids, ingredient_ids)
+
+
+def get_ingredient_ids(*recipe_ids):
+    return set(IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', flat=True))
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, default=None, null=True, upload_to='users/images/', verbose_name='Изображение'),
+        ),
+    ]
@@ -7,8 +7,13 @@ class User(AbstractUser):
         upload_to='users/images/',
         blank=True, null=True,
         default=None,
+        db_index=True,
         verbose_name='Изображение'
     )
+    avatar_variants_source = models.CharField(
+        max_length=100, blank=True, default='', editable=False,
+        verbose_name='Изображение, для которого созданы миниатюры'
+    )
 
     class Meta:
         verbose_name = 'Пользователь'